@@ -42,6 +42,9 @@ setup(
         'sos>=0.19.8',
         'sos-notebook>=0.24.0',
     ],
+    extras_require={
+        'dev': ['pytest', 'pytest-xdist', 'selenium'],
+    },
     entry_points='''
 [sos_languages]
 Julia = sos_julia.kernel:sos_Julia
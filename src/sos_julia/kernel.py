@@ -3,31 +3,147 @@
 # Copyright (c) Bo Peng and the University of Texas MD Anderson Cancer Center
 # Distributed under the terms of the 3-clause BSD License.
 
+import ast
+import atexit
+import math
+import os
+import re
+import shutil
 import tempfile
 from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
 
 import numpy
 import pandas
 from IPython.core.error import UsageError
 from sos.utils import env, short_repr
 
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
 
 def homogeneous_type(seq):
-    iseq = iter(seq)
-    first_type = type(next(iseq))
-    if first_type in (int, float):
-        return True if all(isinstance(x, (int, float)) for x in iseq) else False
-    return True if all(isinstance(x, first_type) for x in iseq) else False
+    # a mixture of int and float ('mixed-integer-float') is considered homogeneous
+    s = seq if isinstance(seq, pandas.Series) else pandas.Series(seq)
+    return s.dtype != object or pandas.api.types.infer_dtype(s, skipna=True) not in ('mixed', 'mixed-integer')
+
+
+def read_dataframe(path):
+    # read an Arrow IPC stream written by julia, memory mapped to avoid copying the file,
+    # and remove the file that is no longer needed
+    with pyarrow.memory_map(path) as source:
+        data = pyarrow.ipc.open_stream(source).read_pandas(self_destruct=True)
+    try:
+        os.remove(path)
+    except OSError:
+        # the file cannot be removed on windows if data still uses the mapped memory
+        pass
+    return data
+
+
+def write_dataframe(data, path):
+    # write a DataFrame as an LZ4 compressed Arrow IPC stream to be read by Arrow.Table()
+    table = pyarrow.Table.from_pandas(data, preserve_index=False)
+    options = pyarrow.ipc.IpcWriteOptions(compression='lz4')
+    with pyarrow.OSFile(path, 'wb') as sink, pyarrow.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+
+
+def read_raw(path, dtype):
+    # read a vector written by julia as raw bytes, and remove the file that is no
+    # longer needed
+    data = numpy.fromfile(path, dtype=dtype)
+    os.remove(path)
+    return data
+
+
+def _julia_float_repr(x):
+    # repr of a python float in Julia, which writes nan and inf as NaN and Inf
+    if math.isfinite(x):
+        return repr(x)
+    return 'NaN' if math.isnan(x) else ('Inf' if x > 0 else '-Inf')
+
+
+_TRANSFER_DIR = None
+
+
+def _transfer_dir():
+    # directory of the files used to pass data to julia, shared by all sos_Julia
+    # objects because sos creates one for each %get and %put
+    global _TRANSFER_DIR
+    if _TRANSFER_DIR is None:
+        _TRANSFER_DIR = tempfile.mkdtemp(prefix='sos_julia_')
+        atexit.register(shutil.rmtree, _TRANSFER_DIR, ignore_errors=True)
+    return _TRANSFER_DIR
+
+
+def _decode_py_repr(expr):
+    # convert a repr returned by __julia_py_tagged_repr to a python object, avoiding
+    # eval() for literals
+    tag, body = expr[:1], expr[1:]
+    if tag == 'I':
+        return int(body)
+    if tag == 'F':
+        return float(body)
+    if tag == 'S':
+        return body
+    if tag == 'L':
+        return ast.literal_eval(body)
+    return eval(body, _EVAL_NAMESPACE)
+
+
+# names available to the expressions evaluated by _decode_py_repr
+_EVAL_NAMESPACE = {
+    '__builtins__': {'complex': complex, 'float': float},
+    'numpy': numpy,
+    'pandas': pandas,
+    'read_dataframe': read_dataframe,
+    'read_raw': read_raw,
+}
+
+# numeric vectors with at least this many elements are passed between SoS
+# and Julia as raw bytes instead of as a repr of each element
+_RAW_TRANSFER_MIN_SIZE = 64
+
+# Julia element types of numpy dtypes that can be passed as raw bytes,
+# keyed by dtype kind and itemsize
+_JULIA_RAW_TYPES = {
+    'b1': 'Bool',
+    'i1': 'Int8',
+    'i2': 'Int16',
+    'i4': 'Int32',
+    'i8': 'Int64',
+    'u1': 'UInt8',
+    'u2': 'UInt16',
+    'u4': 'UInt32',
+    'u8': 'UInt64',
+    'f2': 'Float16',
+    'f4': 'Float32',
+    'f8': 'Float64',
+}
+
+# numpy scalar types whose python value (item()) has a repr() that is a valid
+# Julia expression, checked with type(obj) in ... which avoids an isinstance()
+# call per type. The repr of numpy scalars themselves is np.int64(3) etc. with
+# numpy >= 2
+_NP_REPRABLE_SCALARS = frozenset([
+    numpy.intc, numpy.intp, numpy.int8, numpy.int16, numpy.int32, numpy.int64, numpy.uint8, numpy.uint16,
+    numpy.uint32, numpy.uint64, numpy.float16, numpy.float32, numpy.float64
+])
 
 
 julia_install_package = {
-    'feather': r'''
+    'arrow': r'''
 try
-  using Feather
+  using Arrow
 catch
   using Pkg
-  Pkg.add("Feather")
-  using Feather
+  Pkg.add("Arrow")
+  using Arrow
 end
 ''',
     'namedarray': r'''
@@ -50,65 +166,105 @@ end
 '''
 }
 
+# start of the error raised by the cell of get_vars, followed by the names of
+# the variables that could not be assigned
+_GET_VARS_FAILED = 'Failed to put variables to julia: '
+
+# julia packages needed by the reprs produced by _julia_repr, detected in a
+# single scan of the repr
+_PKG_DETECT_RE = re.compile(r'Arrow\.|NamedArray|DataFrame')
+_PKG_OF_MATCH = {
+    'Arrow.': 'arrow',
+    'NamedArray': 'namedarray',
+    'DataFrame': 'dataframes',
+}
+
 julia_init_statements = r'''
-function __julia_py_repr_logical_1(obj)
+function __julia_py_repr_logical_1(obj::Bool)
     obj==true ? "True" : "False"
 end
-function __julia_py_repr_integer_1(obj)
+function __julia_py_repr_integer_1(obj::Int)
     return string(obj)
 end
-function __julia_py_repr_double_1(obj)
-    return "numpy.float64(" * string(obj) * ")"
+function __julia_py_repr_double_1(obj::Float64)
+  # Inf and NaN are not python literals
+  return isfinite(obj) ? string(obj) : "float(\"" * string(obj) * "\")"
 end
-function __julia_py_repr_complex_1(obj)
-  rl = real(obj)
-  im = imag(obj)
-  return "complex(" * string(rl) * "," * string(im) * ")"
+function __julia_py_repr_complex_1(obj::Complex)
+  return sprint(print, "complex(", real(obj), ",", imag(obj), ")")
 end
 function __julia_py_repr_character_1(obj)
   return "r\"\"\"" * obj * "\"\"\""
 end
-function __julia_py_repr_dict_1(obj)
-  val = collect(values(obj))
-  key = collect(keys(obj))
-  res = __julia_py_repr_character_1(key[1]) * ":" * string(__julia_py_repr(val[1])) * ","
-  for i in 2:length(val)
-    res = res * __julia_py_repr_character_1(key[i]) * ":" * string(__julia_py_repr(val[i])) * ","
+# write f(i) for each item of obj to io, separated by commas. F is a type
+# parameter so that the function is specialized for each f
+function __julia_py_repr_join(io::IO, f::F, obj) where {F}
+  isfirst = true
+  for i in obj
+    isfirst || write(io, ',')
+    isfirst = false
+    write(io, f(i))
+  end
+end
+function __julia_py_repr_dict_1(obj::AbstractDict)
+  io = IOBuffer(sizehint = max(16, 32 * length(obj)))
+  write(io, '{')
+  isfirst = true
+  for (k, v) in obj
+    isfirst || write(io, ',')
+    isfirst = false
+    # keys are converted to strings, as names of python dictionaries
+    write(io, __julia_py_repr_character_1(string(k)), ':', __julia_py_repr(v))
   end
-  return "{" * res * "}"
+  write(io, '}')
+  return String(take!(io))
+end
+# packages loaded by sos_Julia.load(), tested before the slower isdefined() that
+# accepts packages loaded by the user
+const __SOS_LOADED = Set{Symbol}()
+function __julia_py_has_package(package::Symbol, mod::Symbol)
+  return package in __SOS_LOADED || isdefined(@__MODULE__, mod)
 end
 # Dataframe in Julia doesn't have rowname. Will keep tracking any update of Dataframes package in Julia
 function __julia_py_repr_dataframe(obj)
+  __julia_py_has_package(:arrow, :Arrow) || return "SOS_JULIA_REQUIRE:arrow"
   tf = joinpath(tempname())
-  if !isdefined(@__MODULE__, :Feather)
-    return "SOS_JULIA_REQUIRE:feather"
-  end
-  Feather.write(tf, obj)
+  Arrow.write(tf, obj; file = false)
   return "read_dataframe(\"" * tf * "\")"
 end
 function __julia_py_repr_matrix(obj)
+  __julia_py_has_package(:dataframes, :DataFrames) || return "SOS_JULIA_REQUIRE:dataframes"
+  __julia_py_has_package(:arrow, :Arrow) || return "SOS_JULIA_REQUIRE:arrow"
   tf = joinpath(tempname())
-  if !isdefined(@__MODULE__, :DataFrame)
-    return "SOS_JULIA_REQUIRE:dataframes"
-  end
-  if !isdefined(@__MODULE__, :Feather)
-    return "SOS_JULIA_REQUIRE:feather"
-  end
-  Feather.write(tf, convert(DataFrame, obj))
+  Arrow.write(tf, DataFrame(obj, :auto); file = false)
   return "numpy.asmatrix(read_dataframe(\"" * tf * "\"))"
 end
 # namedarray is specific for list with names (and named vector in R)
 function __julia_py_repr_namedarray(obj)
   key = names(obj)[1]
-  val = [obj[i] for i in 1:length(key)]
-  return "pandas.Series(" * "[" * join([__julia_py_repr(i) for i in val], ",") * "]," * "index=[" * join([__julia_py_repr(j) for j in key], ",") * "])"
+  io = IOBuffer()
+  write(io, "pandas.Series([")
+  __julia_py_repr_join(io, __julia_py_repr, (obj[i] for i in 1:length(key)))
+  write(io, "],index=[")
+  __julia_py_repr_join(io, __julia_py_repr, key)
+  write(io, "])")
+  return String(take!(io))
+end
+# repr of a sequence as prefix * elements * suffix, with each element converted by f.
+# The buffer is allocated for elements of about width characters.
+function __julia_py_repr_seq(obj, f::F, prefix, suffix, width = 20) where {F}
+  io = IOBuffer(sizehint = max(16, width * length(obj)))
+  write(io, prefix)
+  __julia_py_repr_join(io, f, obj)
+  write(io, suffix)
+  return String(take!(io))
 end
-function __julia_py_repr_set(obj)
-  return "{" * join([__julia_py_repr(i) for i in obj], ",") * "}"
+function __julia_py_repr_set(obj::AbstractSet)
+  return __julia_py_repr_seq(obj, __julia_py_repr, '{', '}')
 end
-function __julia_py_repr_n(obj)
+function __julia_py_repr_n(obj::AbstractVector)
   # The problem of join() is that it would ignore the double quote of a string
-  return "[" * join([__julia_py_repr(i) for i in obj], ",") * "]"
+  return __julia_py_repr_seq(obj, __julia_py_repr, '[', ']')
 end
 function __julia_has_row_names(df)
   return !(names(df)[1]==collect(1:size(df)[1]))
@@ -116,69 +272,117 @@ end
 function __julia_has_col_names(df)
   return !(names(df)[2]==collect(1:size(df)[2]))
 end
-function __julia_py_repr(obj)
+# pass long numeric vectors as raw bytes instead of one repr per element
+const __JULIA_RAW_TRANSFER_MIN_LENGTH = 64
+function __julia_py_repr_raw(obj, dtype)
+  tf = joinpath(tempname())
+  write(tf, obj)
+  return "read_raw(\"" * tf * "\", \"" * dtype * "\")"
+end
+# type of NaN in Julia is Float64
+function __julia_py_repr_float64(obj::Float64)
+  return obj === NaN ? "None" : __julia_py_repr_double_1(obj)
+end
+function __julia_py_repr_vector_int(obj::Vector{Int})
+  if (length(obj) == 1)
+    return __julia_py_repr_integer_1(obj[1])
+  end
+  if length(obj) >= __JULIA_RAW_TRANSFER_MIN_LENGTH
+    return __julia_py_repr_raw(obj, "<i$(sizeof(Int))")
+  end
+  return __julia_py_repr_seq(obj, __julia_py_repr_integer_1, "numpy.array([", "])", 12)
+end
+function __julia_py_repr_vector_complex(obj::Union{Vector{Complex{Int}}, Vector{Complex{Float64}}})
+  if (length(obj) == 1)
+    return __julia_py_repr_complex_1(obj[1])
+  end
+  return __julia_py_repr_seq(obj, __julia_py_repr_complex_1, "[", "]")
+end
+function __julia_py_repr_vector_double(obj::Vector{Float64})
+  if (length(obj) == 1)
+    return __julia_py_repr_double_1(obj[1])
+  end
+  if length(obj) >= __JULIA_RAW_TRANSFER_MIN_LENGTH
+    return __julia_py_repr_raw(obj, "<f8")
+  end
+  return __julia_py_repr_seq(obj, __julia_py_repr_double_1, "numpy.array([", "], dtype=\"f8\")", 25)
+end
+function __julia_py_repr_vector_character(obj::Vector{String})
+  if (length(obj) == 1)
+    return __julia_py_repr_character_1(obj[1])
+  end
+  return __julia_py_repr_seq(obj, __julia_py_repr_character_1, "[", "]")
+end
+function __julia_py_repr_vector_logical(obj::Vector{Bool})
+  if (length(obj) == 1)
+    return __julia_py_repr_logical_1(obj[1])
+  end
+  return __julia_py_repr_seq(obj, __julia_py_repr_logical_1, "[", "]")
+end
+# repr functions for concrete types, looked up by typeof(obj) so that common
+# types do not go through the isa() checks of __julia_py_repr_generic
+const __JULIA_REPR_TABLE = IdDict{DataType,Function}(
+  Nothing => obj -> "None",
+  Bool => __julia_py_repr_logical_1,
+  Int => __julia_py_repr_integer_1,
+  Float64 => __julia_py_repr_float64,
+  String => __julia_py_repr_character_1,
+  Char => obj -> __julia_py_repr_character_1(string(obj)),
+  Vector{Int} => __julia_py_repr_vector_int,
+  Vector{Complex{Int}} => __julia_py_repr_vector_complex,
+  Vector{Complex{Float64}} => __julia_py_repr_vector_complex,
+  Vector{Float64} => __julia_py_repr_vector_double,
+  Vector{String} => __julia_py_repr_vector_character,
+  Vector{Bool} => __julia_py_repr_vector_logical,
+  Vector{Any} => __julia_py_repr_n,
+)
+function __julia_py_repr_generic(obj)
   if isa(obj, Matrix)
     __julia_py_repr_matrix(obj)
   elseif isa(obj, Set)
     __julia_py_repr_set(obj)
-  # type of NaN in Julia is Float64
-  elseif isa(obj, Cvoid) || obj === NaN
-    return "None"
   elseif isa(obj, Dict)
     __julia_py_repr_dict_1(obj)
     # if needed to name vector in julia, need to use a package called NamedArrays
-  elseif isa(obj, Vector{Int})
-    if (length(obj) == 1)
-      __julia_py_repr_integer_1(obj)
-    else
-      return "numpy.array([" * join([__julia_py_repr_integer_1(i) for i in obj], ",") * "])"
-    end
-  elseif isa(obj, Vector{Complex{Int}}) || isa(obj, Vector{Complex{Float64}})
-    if (length(obj) == 1)
-      __julia_py_repr_complex_1(obj)
-    else
-      return "[" * join([__julia_py_repr_complex_1(i) for i in obj], ",") * "]"
-    end
-  elseif isa(obj, Vector{Float64})
-    if (length(obj) == 1)
-      __julia_py_repr_double_1(obj)
-    else
-      return "numpy.array([" * join([__julia_py_repr_double_1(i) for i in obj], ",") * "], dtype=numpy.float64)"
-    end
-  elseif isa(obj, Vector{String})
-    if (length(obj) == 1)
-      __julia_py_repr_character_1(obj)
-    else
-      return "[" * join([__julia_py_repr_character_1(i) for i in obj], ",") * "]"
-    end
-  elseif isa(obj, Vector{Any})
-      return "[" * join([__julia_py_repr(i) for i in obj], ",") * "]"
-  elseif isa(obj, Vector{Bool})
-    if (length(obj) == 1)
-      __julia_py_repr_logical_1(obj)
-    else
-      return "[" * join([__julia_py_repr_logical_1(i) for i in obj], ",") * "]"
-    end
-  elseif isa(obj, Int)
-    __julia_py_repr_integer_1(obj)
   elseif isa(obj, Complex)
     __julia_py_repr_complex_1(obj)
-  elseif isa(obj, Float64)
-    __julia_py_repr_double_1(obj)
-  elseif isa(obj, String)
-    __julia_py_repr_character_1(obj)
-  elseif isa(obj, Char)
-    __julia_py_repr_character_1(string(obj))
-  elseif isa(obj, Bool)
-    __julia_py_repr_logical_1(obj)
-  elseif startswith(string(typeof(obj)),"DataFrame")
+  elseif isdefined(@__MODULE__, :DataFrames) && isa(obj, DataFrames.AbstractDataFrame)
     __julia_py_repr_dataframe(obj)
-  elseif startswith(string(typeof(obj)),"NamedArray")
+  elseif isdefined(@__MODULE__, :NamedArrays) && isa(obj, NamedArrays.NamedArray)
+    return __julia_py_repr_namedarray(obj)
+  # the packages can be loaded without being bound in this module (e.g. as a
+  # dependency of another package), so also match by type name
+  elseif startswith(string(nameof(typeof(obj))), "DataFrame")
+    __julia_py_repr_dataframe(obj)
+  elseif startswith(string(nameof(typeof(obj))), "NamedArray")
     return __julia_py_repr_namedarray(obj)
   else
     return "'Untransferrable variable'"
   end
 end
+function __julia_py_repr(obj)
+  f = get(__JULIA_REPR_TABLE, typeof(obj), nothing)
+  return f === nothing ? __julia_py_repr_generic(obj) : f(obj)
+end
+# repr with a leading tag that tells how to convert it to a python object: I (integer),
+# F (float), S (string), L (python literal), or J (expression that needs to be evaluated),
+# or R followed by the name of a package that needs to be loaded first
+function __julia_py_tagged_repr(obj)
+  if isa(obj, Int)
+    return "I" * string(obj)
+  elseif isa(obj, Float64) && isfinite(obj)
+    return "F" * string(obj)
+  elseif isa(obj, String)
+    return "S" * obj
+  end
+  res = __julia_py_repr(obj)
+  if startswith(res, "SOS_JULIA_REQUIRE:")
+    return "R" * last(split(res, ":"))
+  elseif isa(obj, Union{Bool, Nothing, Vector{String}, Vector{Bool}})
+    return "L" * res
+  end
+  return "J" * res
+end
 '''
 
 
@@ -193,20 +397,74 @@ class sos_Julia:
         self.kernel_name = kernel_name
         self.init_statements = julia_init_statements
         self.loaded = set()
+        # files used to pass data to julia, which are removed after each %get
+        self._transfer_files = []
+        # handlers of _julia_repr for common types, looked up by exact type
+        self._repr_table = {
+            bool: lambda obj: 'true' if obj else 'false',
+            int: repr,
+            float: repr,
+            # Not using repr() here becasue of the problem of qoutes in Julia.
+            str: lambda obj: '"""' + obj + '"""',
+            complex: lambda obj: 'complex(' + str(obj.real) + ',' + str(obj.imag) + ')',
+            list: self._repr_list,
+            tuple: self._repr_list,
+            dict: self._repr_dict,
+            set: self._repr_set,
+            type(None): lambda obj: 'NaN',
+        }
+        self._repr_table.update(dict.fromkeys(_NP_REPRABLE_SCALARS, lambda obj: repr(obj.item())))
+
+    def _load_code(self, package):
+        return julia_install_package[package] + f'push!(__SOS_LOADED, :{package})\n'
 
     def load(self, package):
+        # run_cell is a coroutine, so the cell is sent with get_response from
+        # put_vars, which is not
+        if package in self.loaded:
+            return True
+
+        if package in julia_install_package:
+            errors = self.sos_kernel.get_response(self._load_code(package), ('error',))
+            if errors:
+                self.sos_kernel.warn(f'Failed to load package {package}: {errors[0][1].get("evalue", "")}')
+                return False
+            self.loaded.add(package)
+            return True
+
+        self.sos_kernel.warn(f'Install of package {package} is not supported.')
+        return False
+
+    async def load_async(self, package):
+        # same as load(), for get_vars, which can await run_cell
         if package in self.loaded:
             return True
 
         if package in julia_install_package:
-            self.sos_kernel.run_cell(
-                julia_install_package[package], True, False, on_error=f'Install of package {package} is not supported.')
+            res = await self.sos_kernel.run_cell(
+                self._load_code(package), True, False, on_error=f'Failed to load package {package}')
+            if res is not None and res.get('status') == 'error':
+                self.sos_kernel.warn(f'Failed to load package {package}: {res.get("evalue", "")}')
+                return False
             self.loaded.add(package)
             return True
 
         self.sos_kernel.warn(f'Install of package {package} is not supported.')
         return False
 
+    def _transfer_file(self, suffix):
+        path = os.path.join(_transfer_dir(), f'xfer_{uuid4().hex}{suffix}')
+        self._transfer_files.append(path)
+        return path
+
+    def _remove_transfer_files(self):
+        for path in self._transfer_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._transfer_files = []
+
 
 #  support for %get
 #
@@ -216,88 +474,112 @@ class sos_Julia:
 #
 
     def _julia_repr(self, obj):
+        handler = self._repr_table.get(type(obj))
+        return handler(obj) if handler is not None else self._julia_repr_slow(obj)
+
+    def _repr_list(self, obj):
+        return '[' + ','.join([self._julia_repr(x) for x in obj]) + ']'
+
+    def _repr_dict(self, obj):
+        return 'Dict(' + ','.join([f'"{x}" => {self._julia_repr(y)}' for x, y in obj.items()]) + ')'
+
+    def _repr_set(self, obj):
+        return 'Set([' + ','.join([self._julia_repr(x) for x in obj]) + '])'
+
+    def _julia_repr_slow(self, obj):
+        # subclasses of the types in self._repr_table, and other types
+        if isinstance(obj, numpy.generic):
+            # other numpy scalars such as numpy.bool_, converted to python objects
+            return self._julia_repr(obj.item())
         if isinstance(obj, bool):
-            return 'true' if obj else 'false'
+            return self._repr_table[bool](obj)
         if isinstance(obj, (int, float)):
             return repr(obj)
         if isinstance(obj, str):
-            # Not using repr() here becasue of the problem of qoutes in Julia.
-            return '"""' + obj + '"""'
+            return self._repr_table[str](obj)
         if isinstance(obj, complex):
-            return 'complex(' + str(obj.real) + ',' + str(obj.imag) + ')'
+            return self._repr_table[complex](obj)
         if isinstance(obj, Sequence):
-            if len(obj) == 0:
-                return '[]'
-            return '[' + ','.join(self._julia_repr(x) for x in obj) + ']'
-        if obj is None:
-            return 'NaN'
+            return self._repr_list(obj)
         if isinstance(obj, dict):
-            return 'Dict(' + ','.join(f'"{x}" => {self._julia_repr(y)}' for x, y in obj.items()) + ')'
+            return self._repr_dict(obj)
         if isinstance(obj, set):
-            return 'Set([' + ','.join(self._julia_repr(x) for x in obj) + '])'
-        if isinstance(obj, (numpy.intc, numpy.intp, numpy.int8, numpy.int16, numpy.int32, numpy.int64,\
-                numpy.uint8, numpy.uint16, numpy.uint32, numpy.uint64, numpy.float16, numpy.float32)):
-            return repr(obj)
+            return self._repr_set(obj)
         # need to specify Float64() as the return to Julia in order to avoid losing precision
         if isinstance(obj, numpy.float64):
             return 'Float64(' + obj + ')'
         if isinstance(obj, numpy.matrixlib.defmatrix.matrix):
-            try:
-                import feather
-            except ImportError as e:
-                raise UsageError('The feather-format module is required to pass numpy matrix as julia matrix(array)'
-                                 'See https://github.com/wesm/feather/tree/master/python for details.') from e
-            feather_tmp_ = tempfile.NamedTemporaryFile(suffix='.feather', delete=False).name
-            try:
-                feather.write_dataframe(
-                    pandas.DataFrame(obj, columns=map(str, range(obj.shape[1]))), feather_tmp_, version=1)
-            except TypeError:
-                # earlier version of feather-format does not support parameter version
-                # V1 will be used in the old versin of feather anyway
-                feather.write_dataframe(pandas.DataFrame(obj, columns=map(str, range(obj.shape[1]))), feather_tmp_)
-            return 'convert(Matrix, Feather.read("' + feather_tmp_ + '"))'
+            if pyarrow is None:
+                raise UsageError('The pyarrow module is required to pass numpy matrix as julia matrix(array)'
+                                 'See https://arrow.apache.org/docs/python/install.html for details.')
+            arrow_tmp_ = self._transfer_file('.arrow')
+            write_dataframe(pandas.DataFrame(obj, columns=map(str, range(obj.shape[1]))), arrow_tmp_)
+            return 'Matrix(DataFrame(Arrow.Table("' + arrow_tmp_ + '")))'
         if isinstance(obj, numpy.ndarray):
-            return '[' + ','.join(self._julia_repr(x) for x in obj) + ']'
+            raw_type = obj.dtype.kind + str(obj.dtype.itemsize)
+            if raw_type in _JULIA_RAW_TYPES and obj.ndim == 1 and obj.size >= _RAW_TRANSFER_MIN_SIZE:
+                raw_tmp_ = self._transfer_file('.bin')
+                obj.astype(obj.dtype.newbyteorder('<'), copy=False).tofile(raw_tmp_)
+                return f'collect(reinterpret({_JULIA_RAW_TYPES[raw_type]}, read("{raw_tmp_}")))'
+            if obj.dtype.kind in 'iuf' and obj.ndim == 1:
+                # tolist() converts to python numbers in one call, and their repr is
+                # also valid in Julia except for nan and inf. The element type is given
+                # so that the vector has the same type as one passed as raw bytes
+                to_julia = _julia_float_repr if obj.dtype.kind == 'f' else repr
+                return _JULIA_RAW_TYPES.get(raw_type, '') + '[' + ','.join(map(to_julia, obj.tolist())) + ']'
+            if raw_type in _JULIA_RAW_TYPES:
+                return self._julia_repr(obj.tolist())
+            return '[' + ','.join([self._julia_repr(x) for x in obj]) + ']'
         if isinstance(obj, pandas.DataFrame):
+            if pyarrow is None:
+                raise UsageError('The pyarrow module is required to pass pandas DataFrame as julia.DataFrames'
+                                 'See https://arrow.apache.org/docs/python/install.html for details.')
+            arrow_tmp_ = self._transfer_file('.arrow')
+            # Julia DataFrame does not have index
+            if not isinstance(obj.index, pandas.RangeIndex):
+                self.sos_kernel.warn('Raw index is ignored because Julia DataFrame does not support raw index.')
             try:
-                import feather
-            except ImportError as e:
-                raise UsageError('The feather-format module is required to pass pandas DataFrame as julia.DataFrames'
-                                 'See https://github.com/wesm/feather/tree/master/python for details.') from e
-            feather_tmp_ = tempfile.NamedTemporaryFile(suffix='.feather', delete=False).name
-            try:
-                data = obj.copy()
-                # Julia DataFrame does not have index
-                if not isinstance(data.index, pandas.RangeIndex):
-                    self.sos_kernel.warn('Raw index is ignored because Julia DataFrame does not support raw index.')
-                try:
-                    feather.write_dataframe(data, feather_tmp_, version=1)
-                except TypeError:
-                    # earlier version of feather-format does not support parameter version
-                    feather.write_dataframe(data, feather_tmp_)
-            except Exception:
-                # if data cannot be written, we try to manipulate data
+                write_dataframe(obj, arrow_tmp_)
+            except (TypeError, pyarrow.ArrowInvalid):
+                # if data cannot be written, we try to manipulate a copy of the data
                 # frame to have consistent types and try again
-                for c in data.columns:
-                    if not homogeneous_type(data[c]):
-                        data[c] = [str(x) for x in data[c]]
-                try:
-                    feather.write_dataframe(data, feather_tmp_, version=1)
-                except TypeError:
-                    # earlier version of feather-format does not support parameter version
-                    feather.write_dataframe(data, feather_tmp_)
+                data = obj.copy()
+
+                def coerce(c):
+                    return c, None if homogeneous_type(data[c]) else data[c].astype(str)
+
+                # columns are converted in parallel because pandas releases the GIL
+                # during the conversion. Columns are only assigned after all workers
+                # are done because data is read by the workers.
+                with ThreadPoolExecutor() as executor:
+                    results = list(executor.map(coerce, data.columns))
+                for c, converted in results:
+                    if converted is not None:
+                        data[c] = converted
+                write_dataframe(data, arrow_tmp_)
                 # use {!r} for path because the string might contain c:\ which needs to be
                 # double quoted.
-            return 'Feather.read("' + feather_tmp_ + '")'
+            return 'DataFrame(Arrow.Table("' + arrow_tmp_ + '"))'
         if isinstance(obj, pandas.Series):
             dat = list(obj.values)
             ind = list(obj.index.values)
-            ans = 'NamedArray(' + '[' + ','.join(self._julia_repr(x) for x in dat) + ']' + ',([' + ','.join(
-                self._julia_repr(y) for y in ind) + '],))'
+            ans = 'NamedArray(' + '[' + ','.join([self._julia_repr(x) for x in dat]) + ']' + ',([' + ','.join(
+                [self._julia_repr(y) for y in ind]) + '],))'
             return ans.replace("'", '"')
         return repr(f'Unsupported datatype {short_repr(obj)}')
 
     async def get_vars(self, names, as_var=None):
+        try:
+            await self._get_vars(names, as_var)
+        finally:
+            # the files have been read by julia once run_cell returns
+            self._remove_transfer_files()
+
+    async def _get_vars(self, names, as_var):
+        # all variables are assigned in a single cell to avoid one round trip
+        # to the julia kernel per variable
+        assignments = []
+        packages = set()
         for name in names:
             if as_var:
                 newname = as_var
@@ -308,47 +590,76 @@ class sos_Julia:
                 newname = name
 
             julia_repr = self._julia_repr(env.sos_dict[name])
-            if 'Feather.' in julia_repr:
-                self.load('feather')
-            if 'NamedArray' in julia_repr:
-                self.load('namedarray')
-            if 'DataFrame' in julia_repr:
-                self.load('dataframes')
-            await self.sos_kernel.run_cell(
+            packages.update(_PKG_OF_MATCH[x] for x in _PKG_DETECT_RE.findall(julia_repr))
+            assignments.append((name, newname, julia_repr))
+        for package in sorted(packages):
+            await self.load_async(package)
+
+        # failed assignments do not stop the others, and are reported together
+        # at the end of the cell
+        lines = ['__sos_failed_vars = String[]']
+        for name, newname, julia_repr in assignments:
+            lines.append(f"""\
+try
+  global {newname} = {julia_repr}
+catch
+  push!(__sos_failed_vars, "{name}")
+end""")
+        lines.append(f'isempty(__sos_failed_vars) || error("{_GET_VARS_FAILED}" * join(__sos_failed_vars, ", "))')
+        res = await self.sos_kernel.run_cell(
+            '\n'.join(lines), True, False, on_error='Failed to put variables to julia')
+        if res is not None and res.get('status') == 'ok':
+            return
+        # assign the failed variables one by one to report errors by name, or all of
+        # them if the cell failed as a whole (e.g. with a syntax error)
+        evalue = res.get('evalue', '') if res is not None else ''
+        if evalue.startswith(_GET_VARS_FAILED):
+            failed = set(evalue[len(_GET_VARS_FAILED):].split(', '))
+            assignments = [x for x in assignments if x[0] in failed]
+        for name, newname, julia_repr in assignments:
+            res = await self.sos_kernel.run_cell(
                 f'{newname} = {julia_repr}', True, False, on_error=f'Failed to put variable {name} to julia')
+            if res is not None and res.get('status') == 'error':
+                self.sos_kernel.warn(f'Failed to put variable {name} to julia: {res.get("evalue", "")}')
+
+    def _get_string(self, code):
+        # value of a julia expression that returns a string. It is printed to stdout
+        # because the display of a long string is truncated
+        response = self.sos_kernel.get_response(f'print({code})', ('stream',), name=('stdout',))
+        return ''.join(x[1]['text'] for x in response)
 
     def put_vars(self, items, to_kernel=None, as_var=None):
         if not items:
             return {}
 
+        # get the repr of all variables in a single request, separated by \x1e
+        exprs = self._get_string(
+            'join([' + ','.join(f'__julia_py_tagged_repr({item})' for item in items) + '], "\\x1e")').split('\x1e')
+        if len(exprs) != len(items):
+            # a repr contains the separator, so get the reprs one by one
+            exprs = [self._get_string(f'__julia_py_tagged_repr({item})') for item in items]
+
         res = {}
-        for item in items:
-            while True:
-                #
-                # Issue #3: Beause it takes a long time to load Julia Module, we do not import
-                # dataframe, namedarray etc when Julia starts. Rather, we generate an error
-                # message if thosse packages are needed and "using" or "Add" them when needed.
-                #
-                py_repr = f'__julia_py_repr({item})'
-                response = self.sos_kernel.get_response(py_repr, ('execute_result',))[0][1]
-                expr = response['data']['text/plain']
-
-                if expr.startswith('"SOS_JULIA_REQUIRE:'):
-                    package = expr.split(':')[1].rstrip('"')
-                    if not self.load(package):
-                        break
-                else:
+        for item, expr in zip(items, exprs):
+            #
+            # Issue #3: Beause it takes a long time to load Julia Module, we do not import
+            # dataframe, namedarray etc when Julia starts. Rather, we generate an error
+            # message if thosse packages are needed and "using" or "Add" them when needed.
+            #
+            tried = set()
+            while expr.startswith('R'):
+                package = expr[1:]
+                # stop if the package is still required after it has been loaded
+                if package in tried or not self.load(package):
                     break
+                tried.add(package)
+                expr = self._get_string(f'__julia_py_tagged_repr({item})')
+            if expr.startswith('R'):
+                self.sos_kernel.warn(f'Failed to get variable {item}: package {expr[1:]} is not available')
+                return None
 
             try:
-                if 'read_dataframe' in expr:
-                    # imported to be used by eval
-                    from feather import read_dataframe
-
-                    # suppress flakes warning
-                    read_dataframe
-                # evaluate as raw string to correctly handle \\ etc
-                res[as_var if as_var else item] = eval(eval(expr))
+                res[as_var if as_var else item] = _decode_py_repr(expr)
             except Exception as e:
                 self.sos_kernel.warn(f'Failed to evaluate {expr!r}: {e}')
                 return None
@@ -37,6 +37,13 @@ def _wait_for_server(proc, info_file_path):
     raise RuntimeError("Didn't find %s in 30 seconds", info_file_path)
 
 
+@pytest.fixture(scope='session')
+def worker_name(request):
+    """Name of the pytest-xdist worker running the tests, 'master' without xdist"""
+    workerinput = getattr(request.config, 'workerinput', None)
+    return workerinput['workerid'] if workerinput else 'master'
+
+
 @pytest.fixture(scope='session')
 def notebook_server():
     info = {}
@@ -146,14 +153,31 @@ def selenium_driver():
     driver.quit()
 
 
-@pytest.fixture(scope='module')
+@pytest.fixture(scope='session')
 def authenticated_browser(selenium_driver, notebook_server):
     selenium_driver.jupyter_server_info = notebook_server
     selenium_driver.get("{url}?token={token}".format(**notebook_server))
     return selenium_driver
 
 
-@pytest.fixture(scope="class")
+@pytest.fixture(scope="session")
 def notebook(authenticated_browser):
+    # shared by all tests so that the Julia kernel is started only once
     return Notebook.new_notebook(
         authenticated_browser, kernel_name='kernel-sos')
+
+
+@pytest.fixture(scope="session", autouse=True)
+def warm_up(notebook):
+    """Import modules used by the tests once for the shared notebook"""
+    notebook.call('import pandas\nimport numpy', kernel='SoS')
+    notebook.call(
+        '''\
+        try
+            using DataFrames
+        catch
+            Pkg.add("DataFrames")
+            using DataFrames
+        end
+        ''',
+        kernel='Julia')
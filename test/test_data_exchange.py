@@ -3,24 +3,30 @@
 # Copyright (c) Bo Peng and the University of Texas MD Anderson Cancer Center
 # Distributed under the terms of the 3-clause BSD License.
 
+import itertools
+import json
 import random
 
+import pytest
 from sos_notebook.test_utils import NotebookTest
 
 
 class TestDataExchange(NotebookTest):
 
+    # shared by all tests because the julia kernel is kept for the whole session
+    _var_idx = itertools.count(1)
+
+    @pytest.fixture(autouse=True)
+    def _set_var_prefix(self, worker_name):
+        # include worker name so that names stay unique if workers share a kernel
+        self._var_prefix = f'var_{worker_name}_'
+
     def _var_name(self):
-        if not hasattr(self, '_var_idx'):
-            self._var_idx = 0
-        self._var_idx += 1
-        return f'var{self._var_idx}'
+        return f'{self._var_prefix}{next(self._var_idx)}'
 
     def get_from_SoS(self, notebook, sos_expr, expect_error=False):
         var_name = self._var_name()
-        notebook.call(
-            f'import pandas\nimport numpy\n{var_name} = {sos_expr}',
-            kernel='SoS')
+        notebook.call(f'{var_name} = {sos_expr}', kernel='SoS')
         return notebook.check_output(
             f'''\
             %get {var_name}
@@ -28,19 +34,25 @@ class TestDataExchange(NotebookTest):
             kernel='Julia',
             expect_error=expect_error)
 
+    def get_var_from_SoS(self, notebook, sos_expr):
+        # pass sos_expr to julia without displaying it, returns the variable name
+        var_name = self._var_name()
+        notebook.call(f'{var_name} = {sos_expr}', kernel='SoS')
+        notebook.call(f'%get {var_name}', kernel='Julia')
+        return var_name
+
+    def check_julia(self, notebook, julia_expr):
+        # evaluate a boolean expression in julia
+        return notebook.check_output(julia_expr, kernel='Julia') == 'true'
+
+    def check_in_julia(self, notebook, var_name, needle):
+        # if needle appears in the string of any item (column of a DataFrame) of a
+        # julia variable, tested in julia to avoid displaying the whole variable
+        items = f'({var_name} isa AbstractDataFrame ? eachcol({var_name}) : {var_name})'
+        return self.check_julia(notebook, f'any(x -> occursin({json.dumps(needle)}, string(x)), {items})')
+
     def put_to_SoS(self, notebook, julia_expr):
         var_name = self._var_name()
-        if 'DataFrame' in julia_expr:
-            notebook.call(
-                f'''\
-                try
-                    using DataFrames
-                catch
-                    Pkg.add("DataFrames")
-                    using DataFrames
-                end
-                ''',
-                kernel='Julia')
         notebook.call(
             f'''\
             %put {var_name}
@@ -49,23 +61,37 @@ class TestDataExchange(NotebookTest):
             kernel='Julia')
         return notebook.check_output(f'print(repr({var_name}))', kernel='SoS')
 
-    def test_get_none(self, notebook):
-        assert 'NaN' == self.get_from_SoS(notebook, 'None')
-
-    def test_put_nan(self, notebook):
-        assert 'None' == self.put_to_SoS(notebook, 'NaN')
-
-    def test_get_int(self, notebook):
-        assert '123' == self.get_from_SoS(notebook, '123')
-        assert '1234567891234' == self.get_from_SoS(notebook, '1234567891234')
-        assert '123456789123456789' == self.get_from_SoS(
-            notebook, '123456789123456789')
-
-    def test_put_int(self, notebook):
-        assert '123' == self.put_to_SoS(notebook, '123')
-        assert '1234567891234' == self.put_to_SoS(notebook, '1234567891234')
-        assert '123456789123456789' == self.put_to_SoS(notebook,
-                                                       '123456789123456789')
+    @pytest.mark.parametrize('sos_expr,expected', [
+        ('None', 'NaN'),
+        ('123', '123'),
+        ('1234567891234', '1234567891234'),
+        ('123456789123456789', '123456789123456789'),
+        ('True', 'true'),
+        ('False', 'false'),
+        ("'ab c d'", '"ab c d"'),
+        (r"'ab\td'", '"ab\\td"'),
+        ('complex(1, 2.2)', '1.0 + 2.2im'),
+        ('numpy.int64(3)', '3'),
+        ('numpy.float64(1.5)', '1.5'),
+        ('numpy.bool_(True)', 'true'),
+    ])
+    def test_get_value(self, notebook, sos_expr, expected):
+        assert expected == self.get_from_SoS(notebook, sos_expr)
+
+    @pytest.mark.parametrize('julia_expr,expected', [
+        ('NaN', 'None'),
+        ('123', '123'),
+        ('1234567891234', '1234567891234'),
+        ('123456789123456789', '123456789123456789'),
+        ('true', 'True'),
+        ('false', 'False'),
+        ('"ab c d"', "'ab c d'"),
+        ('"ab\td"', "'ab\\td'"),
+        ('4 + 5im', '(4+5j)'),
+        ('"OS_JULIA_REQUIRE:arrow"', "'OS_JULIA_REQUIRE:arrow'"),
+    ])
+    def test_put_value(self, notebook, julia_expr, expected):
+        assert expected == self.put_to_SoS(notebook, julia_expr)
 
     def test_get_double(self, notebook):
         # FIXME: can we improve the precision here? Passing float as string
@@ -77,68 +103,137 @@ class TestDataExchange(NotebookTest):
         val = str(random.random())
         assert abs(float(val) - float(self.put_to_SoS(notebook, val))) < 1e-10
 
-    def test_get_logic(self, notebook):
-        assert 'true' == self.get_from_SoS(notebook, 'True')
-        assert 'false' == self.get_from_SoS(notebook, 'False')
+    def test_put_nonfinite_double(self, notebook):
+        # Inf and NaN are not python literals
+        assert 'inf' == self.put_to_SoS(notebook, 'Inf')
+        assert '-inf' == self.put_to_SoS(notebook, '-Inf')
+        assert 'array([ 1., nan])' == self.put_to_SoS(notebook, '[1.0, NaN]')
+
+    def test_get_multiple(self, notebook):
+        var1, var2 = self._var_name(), self._var_name()
+        notebook.call(f'{var1} = 12\n{var2} = "a\\x1eb"', kernel='SoS')
+        notebook.call(f'%get {var1} {var2}', kernel='Julia')
+        assert self.check_julia(notebook, f'{var1} == 12 && {var2} == "a\\x1eb"')
+
+    def test_put_multiple(self, notebook):
+        # the second value contains the separator of the batched reprs
+        var1, var2 = self._var_name(), self._var_name()
+        notebook.call(
+            f'''\
+            %put {var1} {var2}
+            {var1} = 12
+            {var2} = "a\\x1eb"
+            ''',
+            kernel='Julia')
+        assert "12 'a\\x1eb'" == notebook.check_output(f'print({var1}, repr({var2}))', kernel='SoS')
 
-    def test_put_logic(self, notebook):
-        assert 'True' == self.put_to_SoS(notebook, 'true')
-        assert 'False' == self.put_to_SoS(notebook, 'false')
+    def test_put_multiple_long(self, notebook):
+        # the reprs together are longer than the displayed part of a julia string
+        var1, var2 = self._var_name(), self._var_name()
+        notebook.call(
+            f'''\
+            %put {var1} {var2}
+            {var1} = repeat("a", 20000)
+            {var2} = collect(1:20)
+            ''',
+            kernel='Julia')
+        assert '20000 20' == notebook.check_output(f'print(len({var1}), len({var2}))', kernel='SoS')
 
     def test_get_num_array(self, notebook):
-        output = self.get_from_SoS(notebook, '[99]')
-        assert 'Array' in output and 'Int' in output and '99' in output
+        var = self.get_var_from_SoS(notebook, '[99]')
+        assert self.check_julia(notebook, f'{var} isa Vector{{Int}}')
+        assert self.check_in_julia(notebook, var, '99')
 
-        output = self.get_from_SoS(notebook, '[11, 22]')
-        assert 'Array' in output and 'Int' in output and '22' in output
+        var = self.get_var_from_SoS(notebook, '[11, 22]')
+        assert self.check_julia(notebook, f'{var} isa Vector{{Int}}')
+        assert self.check_in_julia(notebook, var, '22')
         #
-        output = self.get_from_SoS(notebook, '[1.4, 2]')
-        assert 'Array' in output and 'Float' in output and '1.4' in output
+        var = self.get_var_from_SoS(notebook, '[1.4, 2]')
+        assert self.check_julia(notebook, f'{var} isa Vector{{Float64}}')
+        assert self.check_in_julia(notebook, var, '1.4')
 
     def test_put_num_array(self, notebook):
         assert 'array([ 99, 200])' == self.put_to_SoS(notebook, '[99, 200]')
         #
         assert 'array([1.4, 2. ])' == self.put_to_SoS(notebook, '[1.4, 2]')
 
-    def test_get_num_colarray(self, notebook):
-        output = self.get_from_SoS(notebook, 'numpy.array([[11], [22], [33]])')
-        assert 'Array' in output and 'Int' in output and '22' in output
+    def test_get_long_array(self, notebook):
+        # long arrays are passed as raw bytes, short ones as a repr of the same type
+        var = self.get_var_from_SoS(notebook, 'numpy.arange(100)')
+        assert self.check_julia(notebook, f'{var} isa Vector{{Int64}} && {var} == collect(0:99)')
+
+        var = self.get_var_from_SoS(notebook, 'numpy.arange(100, dtype=numpy.float32)')
+        assert self.check_julia(notebook, f'{var} isa Vector{{Float32}} && sum({var}) == 4950')
+
+        var = self.get_var_from_SoS(notebook, 'numpy.arange(3, dtype=numpy.float32)')
+        assert self.check_julia(notebook, f'{var} isa Vector{{Float32}}')
+
+        var = self.get_var_from_SoS(notebook, 'numpy.array([1.5, numpy.nan, numpy.inf, -numpy.inf])')
+        assert self.check_julia(notebook, f'{var} isa Vector{{Float64}} && isnan({var}[2])')
+        assert self.check_julia(notebook, f'{var}[3:4] == [Inf, -Inf]')
 
-        output = self.get_from_SoS(notebook,
-                                   'numpy.array([[11.11], [22.22], [33]])')
-        assert 'Array' in output and 'Float' in output and '22.22' in output
-        output = self.get_from_SoS(
+    def test_put_long_array(self, notebook):
+        var = self._var_name()
+        notebook.call(
+            f'''\
+            %put {var}
+            {var} = collect(1.0:100.0)
+            ''',
+            kernel='Julia')
+        assert 'float64 100 5050.0' == notebook.check_output(
+            f'print({var}.dtype, len({var}), {var}.sum())', kernel='SoS')
+
+    def test_get_num_colarray(self, notebook):
+        var = self.get_var_from_SoS(notebook, 'numpy.array([[11], [22], [33]])')
+        assert self.check_julia(notebook, f'{var} isa Vector{{Vector{{Int}}}}')
+        assert self.check_in_julia(notebook, var, '22')
+
+        var = self.get_var_from_SoS(notebook,
+                                    'numpy.array([[11.11], [22.22], [33]])')
+        assert self.check_julia(notebook, f'{var} isa Vector{{Vector{{Float64}}}}')
+        assert self.check_in_julia(notebook, var, '22.22')
+        var = self.get_var_from_SoS(
             notebook, 'numpy.array([[11.11, 13.1], [22.22, 35.1], [33, 27]])')
-        assert 'Array' in output and 'Float' in output and '22.22' in output
+        assert self.check_julia(notebook, f'{var} isa Vector{{Vector{{Float64}}}}')
+        assert self.check_in_julia(notebook, var, '22.22')
 
     def test_get_num_matrix(self, notebook):
         notebook.call(
             '''\
             import warnings
             warnings.simplefilter(action='ignore', category=FutureWarning)
-            import feather''',
+            import pyarrow''',
             kernel='SoS')
-        output = self.get_from_SoS(
+        var = self.get_var_from_SoS(
             notebook, 'numpy.matrix([[11, 22], [22, 23], [33, 35]])')
-        assert 'Array' in output and 'Int64' in output
-        assert '22' in output and '3×2' in output
+        assert self.check_julia(notebook, f'{var} isa Matrix{{Int64}} && size({var}) == (3, 2)')
+        assert self.check_in_julia(notebook, var, '22')
 
-        output = self.get_from_SoS(
+        var = self.get_var_from_SoS(
             notebook,
-            'numpy.matrix([[11.11, 2, 3], [22.22, 4, 5], [33, 6, 7]])',
-            expect_error=False)
-        assert 'Array' in output and 'Float' in output and '22.22' in output
+            'numpy.matrix([[11.11, 2, 3], [22.22, 4, 5], [33, 6, 7]])')
+        assert self.check_julia(notebook, f'{var} isa Matrix{{Float64}}')
+        assert self.check_in_julia(notebook, var, '22.22')
 
     def test_get_dataframe(self, notebook):
-        output = self.get_from_SoS(
+        var = self.get_var_from_SoS(
             notebook, 'pandas.DataFrame([[11, 22], [22, 23], [33, 35]])')
-        assert 'rows' in output and 'columns' in output and '22' in output and '35' in output
+        assert self.check_julia(notebook, f'{var} isa DataFrame && size({var}) == (3, 2)')
+        assert self.check_in_julia(notebook, var, '22') and self.check_in_julia(notebook, var, '35')
 
-        output = self.get_from_SoS(
+        var = self.get_var_from_SoS(
             notebook,
             '''pandas.DataFrame(dict(a=['aa', 'bb', 'cc'], val=[2, 4333, 5]))'''
         )
-        assert '3 rows × 2 columns' in output and 'aa' in output and '4333' in output
+        assert self.check_julia(notebook, f'{var} isa DataFrame && size({var}) == (3, 2)')
+        assert self.check_in_julia(notebook, var, 'aa') and self.check_in_julia(notebook, var, '4333')
+
+    def test_get_mixed_dataframe(self, notebook):
+        # columns of mixed types cannot be written to arrow and are passed as strings
+        var = self.get_var_from_SoS(notebook, "pandas.DataFrame({'a': [1, 'x', 2.5], 'b': [1, 2, 3]})")
+        assert self.check_julia(notebook, f'nonmissingtype(eltype({var}.a)) <: AbstractString')
+        assert self.check_julia(notebook, f'nonmissingtype(eltype({var}.b)) <: Integer')
+        assert self.check_in_julia(notebook, var, 'x') and self.check_in_julia(notebook, var, '2.5')
 
     def test_put_dataframe(self, notebook):
         output = self.put_to_SoS(
@@ -153,25 +248,18 @@ class TestDataExchange(NotebookTest):
         assert 'array' in output and '88' in output and '2200' in output
 
     def test_get_logic_array(self, notebook):
-        output = self.get_from_SoS(notebook, '[True, False, True]')
-        assert 'Array' in output and 'Bool' in output
+        var = self.get_var_from_SoS(notebook, '[True, False, True]')
+        assert self.check_julia(notebook, f'{var} isa Vector{{Bool}}')
 
     def test_put_logic_array(self, notebook):
         # Note that single element numeric array is treated as single value
         assert '[True, False, True]' == self.put_to_SoS(notebook,
                                                         '[true, false, true]')
 
-    def test_get_str(self, notebook):
-        assert '"ab c d"' == self.get_from_SoS(notebook, "'ab c d'")
-        assert '"ab\\td"' == self.get_from_SoS(notebook, r"'ab\td'")
-
-    def test_put_str(self, notebook):
-        assert "'ab c d'" == self.put_to_SoS(notebook, '"ab c d"')
-        assert "'ab\\td'" == self.put_to_SoS(notebook, '"ab\td"')
-
     def test_get_mixed_list(self, notebook):
-        output = self.get_from_SoS(notebook, '[1.4, True, "asd"]')
-        assert 'Array' in output and '1.4' in output and '"asd"' in output
+        var = self.get_var_from_SoS(notebook, '[1.4, True, "asd"]')
+        assert self.check_julia(notebook, f'{var} isa Vector')
+        assert self.check_in_julia(notebook, var, '1.4') and self.check_in_julia(notebook, var, 'asd')
 
     def test_put_mixed_list(self, notebook):
         output = self.put_to_SoS(notebook, '[2.5, true, "haha"]')
@@ -179,31 +267,33 @@ class TestDataExchange(NotebookTest):
 
     def test_get_dict(self, notebook):
         # Python does not have named ordered list, so get dictionary
-        output = self.get_from_SoS(notebook, "dict(a=1, b=2.5, c='3')")
-        assert 'Dict{String,Any}' in output and '"c"' in output and '"3"' in output and '2.5' in output
+        var = self.get_var_from_SoS(notebook, "dict(a=1, b=2.5, c='3')")
+        assert self.check_julia(notebook, f'{var} isa Dict{{String,Any}}')
+        assert self.check_in_julia(notebook, var, '"c" => "3"') and self.check_in_julia(notebook, var, '2.5')
 
     def test_put_dict(self, notebook):
         output = self.put_to_SoS(notebook, """Dict([("A", 1), ("B", 2)])""")
         assert "'B': 2" in output and "'A': 1" in output
 
+    def test_put_dict_mixed_keys(self, notebook):
+        # keys that are not strings are converted to strings
+        output = self.put_to_SoS(notebook, 'Dict(:a => 1, 2 => "x")')
+        assert "'a': 1" in output and "'2': 'x'" in output
+
     def test_get_set(self, notebook):
-        output = self.get_from_SoS(notebook, "{1.5, 'abc'}")
-        assert '"abc"' in output and 'Set' in output and '1.5' in output
+        var = self.get_var_from_SoS(notebook, "{1.5, 'abc'}")
+        assert self.check_julia(notebook, f'{var} isa Set')
+        assert self.check_in_julia(notebook, var, 'abc') and self.check_in_julia(notebook, var, '1.5')
 
     def test_put_set(self, notebook):
         output = self.put_to_SoS(notebook, """Set([23, 45, 76])""")
         assert '23' in output and '45' in output and '76' in output and '{' in output and '}' in output
 
-    def test_get_complex(self, notebook):
-        assert "1.0 + 2.2im" == self.get_from_SoS(notebook, "complex(1, 2.2)")
-
-    def test_put_complex(self, notebook):
-        assert "(4+5j)" == self.put_to_SoS(notebook, "4 + 5im")
-
     def test_get_recursive(self, notebook):
-        output = self.get_from_SoS(notebook,
-                                   "{'a': 1, 'b': {'c': 3, 'd': 'whatever'}}")
-        assert 'Dict' in output, '"whatever"' in output
+        var = self.get_var_from_SoS(notebook,
+                                    "{'a': 1, 'b': {'c': 3, 'd': 'whatever'}}")
+        assert self.check_julia(notebook, f'{var} isa Dict')
+        assert self.check_in_julia(notebook, var, 'whatever')
 
     def test_put_recursive(self, notebook):
         output = self.put_to_SoS(